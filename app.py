@@ -1,17 +1,61 @@
 from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+from flask.logging import default_handler
 from flask_login import LoginManager, login_required, current_user
 from models import db, User, Transaction, Category
-from services import categorize_transaction, initialize_categories
+from services import (categorize_description, initialize_categories, get_categories,
+                      get_category, month_range, get_cached_spending, get_spending_generation,
+                      cache_spending, invalidate_spending_cache)
 import bank_api
 from config import Config
 from auth import auth_bp
 from datetime import datetime
-from sqlalchemy import func, extract
+from sqlalchemy import func, event, select, bindparam
+from sqlalchemy.schema import CreateIndex
 from werkzeug.security import generate_password_hash
+from jinja2 import FileSystemBytecodeCache
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import logging
+import os
+import queue
+import sys
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
+# Log through a queue so request threads only enqueue records; a background
+# listener does the (possibly blocking) write to stderr
+_log_stream_handler = logging.StreamHandler(sys.stderr)
+_log_stream_handler.setFormatter(default_handler.formatter)
+_log_queue_handler = QueueHandler(queue.SimpleQueue())
+_log_listener = None
+
+
+def _start_log_listener():
+    """Start the thread that drains the log queue into stderr"""
+    global _log_listener
+    _log_listener = QueueListener(_log_queue_handler.queue, _log_stream_handler)
+    _log_listener.start()
+
+
+def _restart_log_listener_after_fork():
+    """Threads do not survive fork() (e.g. gunicorn --preload); give the child its own"""
+    _log_queue_handler.queue = queue.SimpleQueue()
+    _start_log_listener()
+
+
+_start_log_listener()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_log_listener_after_fork)
+atexit.register(lambda: _log_listener.stop())
+app.logger.removeHandler(default_handler)
+app.logger.addHandler(_log_queue_handler)
+
+# Optionally persist compiled templates so restarted workers skip recompiling them
+if app.config['JINJA_BYTECODE_CACHE_DIR']:
+    os.makedirs(app.config['JINJA_BYTECODE_CACHE_DIR'], exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['JINJA_BYTECODE_CACHE_DIR'])
+
 # Initialize database
 db.init_app(app)
 
@@ -27,7 +71,7 @@ login_manager.login_message_category = 'info'
 def load_user(user_id):
     """Load user by ID - FIXED: Better error handling"""
     try:
-        return User.query.get(int(user_id))
+        return db.session.get(User, int(user_id))
     except Exception:
         return None
 
@@ -50,12 +94,45 @@ def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
 
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply the configured PRAGMAs to each new SQLite connection"""
+    cursor = dbapi_connection.cursor()
+    for pragma in app.config['SQLITE_PRAGMAS']:
+        cursor.execute(f'PRAGMA {pragma}')
+    cursor.close()
+
+
 # Initialize database and categories
 with app.app_context():
+    if db.engine.dialect.name == 'sqlite':
+        event.listen(db.engine, 'connect', set_sqlite_pragmas)
     db.create_all()
+    # create_all() skips tables that already exist; add any indexes they are missing.
+    # SQLite reflection cannot see expression indexes, so checkfirst would try to
+    # recreate them; use IF NOT EXISTS where the dialect supports it (MySQL does not).
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                if connection.dialect.name in ('sqlite', 'postgresql'):
+                    connection.execute(CreateIndex(index, if_not_exists=True))
+                else:
+                    index.create(connection, checkfirst=True)
     initialize_categories()
 
 
+# Recent transactions for the dashboard table, built once at import.
+# Plain rows with just the columns the table renders.
+RECENT_TRANSACTIONS = select(
+    Transaction.id,
+    Transaction.date,
+    Transaction.description,
+    Transaction.amount,
+    Transaction.category_id
+).where(
+    Transaction.user_id == bindparam('user_id')
+).order_by(Transaction.date.desc()).limit(100)
+
+
 @app.route('/')
 @login_required
 def dashboard():
@@ -65,10 +142,11 @@ def dashboard():
     """
     try:
         # FIXED: Limit query results to avoid performance issues
-        transactions = Transaction.query.filter_by(user_id=current_user.id)\
-            .order_by(Transaction.date.desc()).limit(100).all()
+        transactions = db.session.execute(
+            RECENT_TRANSACTIONS, {'user_id': current_user.id}
+        ).all()
         
-        categories = Category.query.order_by(Category.name).all()
+        categories = get_categories()
         bank_linked = current_user.aa_token is not None
         
         return render_template('dashboard.html',
@@ -76,7 +154,7 @@ def dashboard():
                              categories=categories,
                              bank_linked=bank_linked)
     except Exception as e:
-        print(f"Dashboard error: {e}")
+        app.logger.exception('Dashboard error: %s', e)
         flash('Error loading dashboard.', 'error')
         return render_template('dashboard.html', 
                              transactions=[], 
@@ -96,7 +174,7 @@ def bank_connect():
             flash('Error connecting to bank.', 'error')
             return redirect(url_for('dashboard'))
     except Exception as e:
-        print(f"Bank connect error: {e}")
+        app.logger.exception('Bank connect error: %s', e)
         flash('Error connecting to bank.', 'error')
         return redirect(url_for('dashboard'))
 
@@ -115,7 +193,7 @@ def bank_callback():
         else:
             flash('Failed to link bank account.', 'error')
     except Exception as e:
-        print(f"Callback error: {e}")
+        app.logger.exception('Callback error: %s', e)
         flash('Error during bank linking.', 'error')
     
     return redirect(url_for('dashboard'))
@@ -130,35 +208,46 @@ def bank_sync():
     """
     try:
         new_transactions_data = bank_api.fetch_new_transactions(current_user)
-        transactions_added = 0
         
-        for tx_data in new_transactions_data:
-            # Check for duplicates
-            tx_date = datetime.strptime(tx_data['date'], '%Y-%m-%d')
-            
-            existing = Transaction.query.filter_by(
-                user_id=current_user.id,
-                date=tx_date,
-                description=tx_data['description'],
-                amount=abs(tx_data['amount'])
-            ).first()
+        tx_dates = [datetime.fromisoformat(tx_data['date'])
+                    for tx_data in new_transactions_data]
+        
+        # Load existing (date, description, amount) keys for the sync window in one query
+        existing_keys = set()
+        if tx_dates:
+            existing_keys = {tuple(row) for row in db.session.query(
+                Transaction.date,
+                Transaction.description,
+                Transaction.amount
+            ).filter(
+                Transaction.user_id == current_user.id,
+                Transaction.date >= min(tx_dates),
+                Transaction.date <= max(tx_dates)
+            )}
+        
+        new_rows = []
+        for tx_date, tx_data in zip(tx_dates, new_transactions_data):
+            # Check for duplicates (including repeats within this batch)
+            key = (tx_date, tx_data['description'], abs(tx_data['amount']))
+            if key in existing_keys:
+                continue
+            existing_keys.add(key)
             
-            if not existing:
-                new_transaction = Transaction(
-                    user_id=current_user.id,
-                    date=tx_date,
-                    description=tx_data['description'],
-                    amount=abs(tx_data['amount'])
-                )
-                
-                db.session.add(new_transaction)
-                db.session.flush()  # Get ID without committing
-                
-                # Auto-categorize
-                categorize_transaction(new_transaction)
-                transactions_added += 1
+            new_rows.append({
+                'user_id': current_user.id,
+                'date': tx_date,
+                'description': tx_data['description'],
+                'amount': abs(tx_data['amount']),
+                # Auto-categorize before insert so no per-row flush is needed
+                'category_id': categorize_description(tx_data['description'])
+            })
         
+        # Single executemany INSERT instead of add() + flush() per row
+        if new_rows:
+            db.session.bulk_insert_mappings(Transaction, new_rows)
         db.session.commit()
+        invalidate_spending_cache(current_user.id)
+        transactions_added = len(new_rows)
         
         return jsonify({
             'status': 'success',
@@ -168,7 +257,7 @@ def bank_sync():
     
     except Exception as e:
         db.session.rollback()
-        print(f"Sync error: {e}")
+        app.logger.exception('Sync error: %s', e)
         return jsonify({
             'status': 'error', 
             'message': 'Failed to sync transactions'
@@ -183,7 +272,7 @@ def categorize_manual(tx_id):
     FIXED: Better validation and error handling
     """
     try:
-        transaction = Transaction.query.get(tx_id)
+        transaction = db.session.get(Transaction, tx_id)
         
         if not transaction:
             return jsonify({
@@ -207,8 +296,8 @@ def categorize_manual(tx_id):
         elif category_id:
             try:
                 category_id = int(category_id)
-                # Verify category exists
-                category = Category.query.get(category_id)
+                # Verify category exists (served from the category cache)
+                category = get_category(category_id)
                 if not category:
                     return jsonify({
                         'status': 'error', 
@@ -222,6 +311,7 @@ def categorize_manual(tx_id):
         
         transaction.category_id = category_id
         db.session.commit()
+        invalidate_spending_cache(current_user.id)
         
         return jsonify({
             'status': 'success',
@@ -230,13 +320,44 @@ def categorize_manual(tx_id):
     
     except Exception as e:
         db.session.rollback()
-        print(f"Categorization error: {e}")
+        app.logger.exception('Categorization error: %s', e)
         return jsonify({
             'status': 'error', 
             'message': 'Failed to update category'
         }), 500
 
 
+def conditional_json(payload):
+    """
+    Build a JSON response with an ETag so the browser can revalidate
+    and receive a bodiless 304 when the payload has not changed.
+    """
+    response = jsonify(payload)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+# Single aggregation pass; rows without a category fold into 'Uncategorized'.
+# Named categories come first in name order and 'Uncategorized' last, so Chart.js
+# (which colours slices by index) keeps a stable colour per label.
+# Built once at import so each request only binds parameters.
+_spending_label = func.coalesce(Category.name, 'Uncategorized')
+SPENDING_BY_CATEGORY = select(
+    _spending_label.label('name'),
+    func.sum(Transaction.amount).label('total')
+).select_from(Transaction).outerjoin(
+    Category, Transaction.category_id == Category.id
+).where(
+    Transaction.user_id == bindparam('user_id'),
+    Transaction.date >= bindparam('month_start'),
+    Transaction.date < bindparam('month_end')
+).group_by(_spending_label).order_by(
+    _spending_label == 'Uncategorized',
+    _spending_label
+)
+
+
 @app.route('/api/spending-by-category')
 @login_required
 def spending_by_category():
@@ -245,46 +366,39 @@ def spending_by_category():
     FIXED: Better SQL query optimization
     """
     try:
-        current_month = datetime.now().month
-        current_year = datetime.now().year
+        now = datetime.now()
+        current_month = now.month
+        current_year = now.year
+        
+        cached = get_cached_spending(current_user.id, current_year, current_month)
+        if cached is not None:
+            return conditional_json(cached)
         
-        # Query with proper aggregation
-        spending_data = db.session.query(
-            Category.name,
-            func.sum(Transaction.amount).label('total')
-        ).join(
-            Transaction, Transaction.category_id == Category.id
-        ).filter(
-            Transaction.user_id == current_user.id,
-            extract('month', Transaction.date) == current_month,
-            extract('year', Transaction.date) == current_year
-        ).group_by(Category.name).all()
+        month_start, month_end = month_range(current_year, current_month)
+        # Read before querying so a write that commits meanwhile blocks the cache store
+        generation = get_spending_generation(current_user.id)
         
-        # Handle uncategorized transactions
-        uncategorized = db.session.query(
-            func.sum(Transaction.amount).label('total')
-        ).filter(
-            Transaction.user_id == current_user.id,
-            Transaction.category_id == None,
-            extract('month', Transaction.date) == current_month,
-            extract('year', Transaction.date) == current_year
-        ).scalar()
+        spending_data = db.session.execute(SPENDING_BY_CATEGORY, {
+            'user_id': current_user.id,
+            'month_start': month_start,
+            'month_end': month_end
+        }).all()
         
         # Format data for Chart.js
         labels = [item[0] for item in spending_data]
         data = [float(item[1]) for item in spending_data]
         
-        if uncategorized and uncategorized > 0:
-            labels.append('Uncategorized')
-            data.append(float(uncategorized))
-        
-        return jsonify({
+        payload = {
             'labels': labels,
             'data': data
-        })
+        }
+        cache_spending(current_user.id, current_year, current_month, payload,
+                       app.config['SPENDING_CACHE_TTL'], generation)
+        
+        return conditional_json(payload)
     
     except Exception as e:
-        print(f"Spending data error: {e}")
+        app.logger.exception('Spending data error: %s', e)
         return jsonify({'labels': [], 'data': []}), 200
 
 
@@ -296,10 +410,14 @@ def generate_demo_data():
     FIXED: Better batch processing
     """
     try:
-        # Clear existing transactions
-        Transaction.query.filter_by(user_id=current_user.id).delete()
+        # Clear existing transactions with a single DELETE; nothing in the
+        # session needs synchronizing since the rows are replaced wholesale
+        Transaction.query.filter_by(user_id=current_user.id).delete(
+            synchronize_session=False
+        )
         
         current_date = datetime.now()
+        new_rows = []
         
         # Generate 3 months of data
         for month_offset in range(3):
@@ -315,22 +433,23 @@ def generate_demo_data():
             )
             
             for tx_data in monthly_transactions:
-                new_transaction = Transaction(
-                    user_id=current_user.id,
-                    date=datetime.strptime(tx_data['date'], '%Y-%m-%d'),
-                    description=tx_data['description'],
-                    amount=abs(tx_data['amount'])
-                )
-                
-                db.session.add(new_transaction)
-                db.session.flush()
-                
-                # Auto-categorize
-                categorize_transaction(new_transaction)
+                new_rows.append({
+                    'user_id': current_user.id,
+                    'date': datetime.fromisoformat(tx_data['date']),
+                    'description': tx_data['description'],
+                    'amount': abs(tx_data['amount']),
+                    # Auto-categorize before insert so no per-row flush is needed
+                    'category_id': categorize_description(tx_data['description'])
+                })
         
+        # Single executemany INSERT for all generated months
+        if new_rows:
+            db.session.bulk_insert_mappings(Transaction, new_rows)
         db.session.commit()
+        invalidate_spending_cache(current_user.id)
         
-        total_count = Transaction.query.filter_by(user_id=current_user.id).count()
+        # Existing rows were cleared above, so the insert size is the total
+        total_count = len(new_rows)
         
         return jsonify({
             'status': 'success',
@@ -340,7 +459,7 @@ def generate_demo_data():
     
     except Exception as e:
         db.session.rollback()
-        print(f"Demo data error: {e}")
+        app.logger.exception('Demo data error: %s', e)
         return jsonify({
             'status': 'error', 
             'message': 'Failed to generate demo data'
@@ -358,7 +477,7 @@ def setup_demo():
                 email=Config.DEMO_USER_EMAIL,
                 password_hash=generate_password_hash(
                     Config.DEMO_USER_PASSWORD, 
-                    method='pbkdf2:sha256'
+                    method=f"pbkdf2:sha256:{app.config['PASSWORD_HASH_ITERATIONS']}"
                 )
             )
             db.session.add(demo_user)
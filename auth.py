@@ -1,10 +1,39 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from models import db, User
+from sqlalchemy import func
+import string
 
 auth_bp = Blueprint('auth', __name__)
 
+# SQLite's lower() only folds ASCII letters; fold emails the same way in Python
+# so normalised values line up with lower(users.email)
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def normalize_email(email):
+    """Strip an email and lowercase its ASCII letters, matching SQL lower()"""
+    return email.strip().translate(_ASCII_LOWER)
+
+
+def find_login_user(email, password):
+    """
+    Return the user these credentials belong to, or None.
+    An exact email match wins. Otherwise every case-insensitive match is tried,
+    because accounts registered before emails were normalised can differ only by case.
+    """
+    user = User.query.filter_by(email=email).first()
+    if user:
+        candidates = [user]
+    else:
+        candidates = User.query.filter(func.lower(User.email) == normalize_email(email)).all()
+    
+    for candidate in candidates:
+        if check_password_hash(candidate.password_hash, password):
+            return candidate
+    return None
+
 
 @auth_bp.route('/register', methods=['GET', 'POST'])
 def register():
@@ -16,7 +45,8 @@ def register():
         return redirect(url_for('dashboard'))
     
     if request.method == 'POST':
-        email = request.form.get('email', '').strip()
+        # Emails are case-insensitive; store and compare the normalised form
+        email = normalize_email(request.form.get('email', ''))
         password = request.form.get('password', '')
         confirm_password = request.form.get('confirm_password', '')
         
@@ -34,14 +64,17 @@ def register():
             return render_template('register.html')
         
         # Check if user exists
-        existing_user = User.query.filter_by(email=email).first()
+        existing_user = User.query.filter(func.lower(User.email) == email).first()
         if existing_user:
             flash('Email already registered. Please log in.', 'error')
             return redirect(url_for('auth.login'))
         
         # Create new user
         try:
-            password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+            password_hash = generate_password_hash(
+                password,
+                method=f"pbkdf2:sha256:{current_app.config['PASSWORD_HASH_ITERATIONS']}"
+            )
             new_user = User(email=email, password_hash=password_hash)
             
             db.session.add(new_user)
@@ -52,7 +85,7 @@ def register():
         except Exception as e:
             db.session.rollback()
             flash('An error occurred during registration. Please try again.', 'error')
-            print(f"Registration error: {e}")
+            current_app.logger.exception('Registration error: %s', e)
             return render_template('register.html')
     
     return render_template('register.html')
@@ -76,9 +109,9 @@ def login():
             flash('Email and password are required.', 'error')
             return render_template('login.html')
         
-        user = User.query.filter_by(email=email).first()
+        user = find_login_user(email, password)
         
-        if not user or not check_password_hash(user.password_hash, password):
+        if not user:
             flash('Invalid email or password. Please try again.', 'error')
             return render_template('login.html')
         
@@ -1,5 +1,9 @@
+import logging
 import random
 from datetime import datetime, timedelta
+from itertools import islice
+
+logger = logging.getLogger(__name__)
 
 
 class SimulatedBankAPI:
@@ -67,7 +71,7 @@ class SimulatedBankAPI:
             return f"/api/bank/callback?code=SIM_{user.id}&state=user_{user.id}"
         except Exception as e:
             db.session.rollback()
-            print(f"Error initiating connection: {e}")
+            logger.error('Error initiating connection: %s', e)
             return None
     
     def handle_api_callback(self, request_args, user):
@@ -86,7 +90,7 @@ class SimulatedBankAPI:
             return True
         except Exception as e:
             db.session.rollback()
-            print(f"Error in callback: {e}")
+            logger.error('Error in callback: %s', e)
             return False
     
     def fetch_new_transactions(self, user, days_back=30, num_transactions=None):
@@ -99,9 +103,12 @@ class SimulatedBankAPI:
         
         transactions = []
         
+        # One clock read; each possible offset is formatted once
+        today = datetime.now().date()
+        date_strs = [(today - timedelta(days=d)).isoformat() for d in range(days_back + 1)]
+        
         for _ in range(num_transactions):
             days_ago = random.randint(0, days_back)
-            transaction_date = datetime.now() - timedelta(days=days_ago)
             
             vendor, category, amount_range = random.choice(self.mock_vendors)
             amount = random.uniform(amount_range[0], amount_range[1])
@@ -111,7 +118,7 @@ class SimulatedBankAPI:
                 vendor = vendor + f" - {random.choice(['ONLINE', 'POS', 'UPI', 'CARD'])}"
             
             transactions.append({
-                'date': transaction_date.strftime('%Y-%m-%d'),
+                'date': date_strs[days_ago],
                 'description': vendor,
                 'amount': round(amount, 2),
                 'category_hint': category if category != 'Income' else None
@@ -128,16 +135,18 @@ class SimulatedBankAPI:
         transactions = []
         num_days = calendar.monthrange(year, month)[1]
         
-        for day in range(1, num_days + 1):
-            # Random transactions per day (0-3)
-            num_daily_txns = random.choices([0, 1, 2, 3], weights=[0.2, 0.4, 0.3, 0.1])[0]
+        # Draw every day's transaction count (0-3) and every vendor in two batched calls
+        daily_counts = random.choices([0, 1, 2, 3], weights=[0.2, 0.4, 0.3, 0.1], k=num_days)
+        vendors = iter(random.choices(self.mock_vendors, k=sum(daily_counts)))
+        
+        for day, num_daily_txns in enumerate(daily_counts, start=1):
+            tx_date = f'{year}-{month:02d}-{day:02d}'
             
-            for _ in range(num_daily_txns):
-                vendor, category, amount_range = random.choice(self.mock_vendors)
+            for vendor, category, amount_range in islice(vendors, num_daily_txns):
                 amount = random.uniform(amount_range[0], amount_range[1])
                 
                 transactions.append({
-                    'date': f'{year}-{month:02d}-{day:02d}',
+                    'date': tx_date,
                     'description': vendor,
                     'amount': round(amount, 2),
                     'category_hint': category if category != 'Income' else None
@@ -13,6 +13,19 @@ class Config:
         'sqlite:///' + os.path.join(basedir, 'fintrack.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False  # Set True for debugging SQL queries
+    # Replace pooled connections before a server-side idle timeout can drop them
+    # (matters when DATABASE_URL points at MySQL/Postgres)
+    SQLALCHEMY_ENGINE_OPTIONS = {'pool_recycle': 1800}
+    
+    # Applied to every new SQLite connection (ignored for other databases).
+    # WAL lets dashboard reads run alongside sync/demo writes.
+    SQLITE_PRAGMAS = (
+        'journal_mode=WAL',
+        'synchronous=NORMAL',
+        'temp_store=MEMORY',
+        'cache_size=-65536',     # 64 MB page cache
+        'mmap_size=268435456',   # 256 MB memory-mapped I/O
+    )
     
     # Session configuration
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
@@ -20,7 +33,16 @@ class Config:
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
     
+    # Password hashing - PBKDF2-SHA256 rounds; hash time scales linearly with this.
+    # 600000 matches Werkzeug's default; existing hashes keep their own count.
+    PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 600000))
+    
     # Application settings
     SIMULATION_MODE = True
     DEMO_USER_EMAIL = 'demo@fintrack.com'
     DEMO_USER_PASSWORD = 'demo123'
+    
+    # Caching
+    SPENDING_CACHE_TTL = 60  # Seconds to reuse a computed spending chart payload
+    # Directory for compiled Jinja templates, reused across worker restarts (unset = off)
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR')
@@ -2,7 +2,9 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
 
-db = SQLAlchemy()
+# Objects stay usable after commit without a reload; every route commits as
+# its last write, so nothing relies on commit-time expiry
+db = SQLAlchemy(session_options={'expire_on_commit': False})
 
 
 class User(UserMixin, db.Model):
@@ -16,6 +18,11 @@ class User(UserMixin, db.Model):
     aa_consent_id = db.Column(db.String(255), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     
+    # Case-insensitive email lookups (login/register) stay index-backed
+    __table_args__ = (
+        db.Index('ix_users_email_lower', db.func.lower(email)),
+    )
+    
     # FIXED: Use lazy='dynamic' to avoid N+1 query problem
     transactions = db.relationship('Transaction', backref='user', lazy='dynamic', 
                                    cascade='all, delete-orphan')
@@ -41,12 +48,17 @@ class Category(db.Model):
 class Transaction(db.Model):
     """Transaction model with proper foreign keys and indexing"""
     __tablename__ = 'transactions'
+    __table_args__ = (
+        # Serves "WHERE user_id = ? [AND date range] ORDER BY date" on every hot query;
+        # category_id and amount make the monthly spending aggregate index-only
+        db.Index('ix_tx_user_date_cat_amount', 'user_id', 'date', 'category_id', 'amount'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.DateTime, nullable=False, index=True)
     description = db.Column(db.String(500), nullable=False)
     amount = db.Column(db.Float, nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -6,28 +6,41 @@ Use this file to start the application
 
 from app import app
 import os
+import sys
+
+BANNER = """\
+{rule}
+🚀 FinTrack - Personal Finance Manager
+{rule}
+
+Application is starting...
+
+📍 Local URL: http://localhost:{port}
+📍 Network URL: http://0.0.0.0:{port}
+
+👤 Demo User Credentials:
+   Email: demo@fintrack.com
+   Password: demo123
+
+{rule}
+
+"""
+
 
 if __name__ == '__main__':
-    print("=" * 70)
-    print("🚀 FinTrack - Personal Finance Manager")
-    print("=" * 70)
-    print()
-    print("Application is starting...")
-    print()
-    print("📍 Local URL: http://localhost:5000")
-    print("📍 Network URL: http://0.0.0.0:5000")
-    print()
-    print("👤 Demo User Credentials:")
-    print("   Email: demo@fintrack.com")
-    print("   Password: demo123")
-    print()
-    print("=" * 70)
-    print()
+    # Debugger and reloader are opt-in (FLASK_DEBUG=1); the reloader stats
+    # every source file in a second process
+    debug = os.environ.get('FLASK_DEBUG', '0') == '1'
+    port = int(os.environ.get('PORT', 5000))
+    
+    # Whole banner in one write instead of a print() per line
+    sys.stdout.write(BANNER.format(rule='=' * 70, port=port))
+    sys.stdout.flush()
     
     # Run the application
     app.run(
-        debug=True,
+        debug=debug,
         host='0.0.0.0',
-        port=5000,
-        use_reloader=True
+        port=port,
+        use_reloader=debug
     )
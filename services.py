@@ -1,48 +1,165 @@
+import logging
+import threading
+import time
+from datetime import datetime
 from models import db, Category
 
-# Indian vendor categorization keywords
+logger = logging.getLogger(__name__)
+
+# Indian vendor categorization keywords (read-only lookup table)
 CATEGORY_KEYWORDS = {
-    'Food & Drink': ['zomato', 'swiggy', 'mcdonalds', 'mcd', 'starbucks', 'cafe coffee day', 'ccd', 
-                     'dominos', 'pizza hut', 'eatsure', 'burger king', 'kfc', 'subway', 'dunkin'],
-    'Groceries': ['bigbasket', 'blinkit', 'zepto', 'grofers', 'jiomart', 'dmart', 'reliance fresh', 
-                  'more', 'spencers', 'nature basket', 'star bazaar'],
-    'Fuel': ['indian oil', 'ioc', 'hpcl', 'hindustan petroleum', 'bharat petroleum', 'bpcl', 
-             'shell', 'essar', 'reliance petroleum', 'petrol', 'diesel', 'fuel'],
-    'Subscriptions': ['netflix', 'spotify', 'prime video', 'amazon prime', 'hotstar', 'disney', 
-                      'jiocinema', 'sonyliv', 'zee5', 'apple music', 'youtube premium', 'voot'],
-    'Utilities': ['bses', 'tata power', 'bescom', 'adani electricity', 'airtel', 'jio', 'vodafone', 
+    'Food & Drink': ('zomato', 'swiggy', 'mcdonalds', 'mcd', 'starbucks', 'cafe coffee day', 'ccd', 
+                     'dominos', 'pizza hut', 'eatsure', 'burger king', 'kfc', 'subway', 'dunkin'),
+    'Groceries': ('bigbasket', 'blinkit', 'zepto', 'grofers', 'jiomart', 'dmart', 'reliance fresh', 
+                  'more', 'spencers', 'nature basket', 'star bazaar'),
+    'Fuel': ('indian oil', 'ioc', 'hpcl', 'hindustan petroleum', 'bharat petroleum', 'bpcl', 
+             'shell', 'essar', 'reliance petroleum', 'petrol', 'diesel', 'fuel'),
+    'Subscriptions': ('netflix', 'spotify', 'prime video', 'amazon prime', 'hotstar', 'disney', 
+                      'jiocinema', 'sonyliv', 'zee5', 'apple music', 'youtube premium', 'voot'),
+    'Utilities': ('bses', 'tata power', 'bescom', 'adani electricity', 'airtel', 'jio', 'vodafone', 
                   'vi', 'bsnl', 'mtnl', 'electricity', 'water bill', 'gas bill', 'piped gas', 
-                  'indraprastha gas', 'mahanagar gas'],
-    'Transport': ['ola', 'uber', 'rapido', 'redbus', 'irctc', 'metro', 'delhi metro', 'mumbai metro', 
-                  'bangalore metro', 'namma metro', 'makemytrip', 'goibibo', 'yatra'],
-    'Shopping': ['amazon', 'flipkart', 'myntra', 'meesho', 'ajio', 'nykaa', 'reliance digital', 
-                 'croma', 'vijay sales', 'lifestyle', 'westside', 'max fashion', 'pantaloons'],
-    'Payments': ['paytm', 'phonepe', 'gpay', 'google pay', 'bhim', 'upi', 'mobikwik'],
-    'Rent/EMI': ['rent', 'emi', 'housing loan', 'home loan', 'hdfc', 'icici', 'sbi', 'axis']
+                  'indraprastha gas', 'mahanagar gas'),
+    'Transport': ('ola', 'uber', 'rapido', 'redbus', 'irctc', 'metro', 'delhi metro', 'mumbai metro', 
+                  'bangalore metro', 'namma metro', 'makemytrip', 'goibibo', 'yatra'),
+    'Shopping': ('amazon', 'flipkart', 'myntra', 'meesho', 'ajio', 'nykaa', 'reliance digital', 
+                 'croma', 'vijay sales', 'lifestyle', 'westside', 'max fashion', 'pantaloons'),
+    'Payments': ('paytm', 'phonepe', 'gpay', 'google pay', 'bhim', 'upi', 'mobikwik'),
+    'Rent/EMI': ('rent', 'emi', 'housing loan', 'home loan', 'hdfc', 'icici', 'sbi', 'axis')
 }
 
+# (id, name) rows of all categories; categories only change in initialize_categories()
+_categories_cache = None
+_categories_by_id_cache = None
+_category_ids_cache = None
+
+# In-process cache of spending chart payloads: user_id -> {(year, month): (expires_at, payload)}
+_spending_cache = {}
+_spending_cache_lock = threading.Lock()
+SPENDING_CACHE_MAX_USERS = 10000
+
+# user_id -> count of invalidations. A payload is only stored if the count has not
+# moved since its query started, so a chart computed before a write cannot be
+# cached after that write's invalidation. The epoch changes whenever the map is
+# cleared so that generations read before the clear never match again.
+_spending_generations = {}
+_spending_epoch = 0
+
 
-def categorize_transaction(transaction):
+def categorize_description(description):
     """
-    Automatically categorize a transaction based on description.
-    FIXED: Better error handling and performance optimization
+    Return the id of the category whose keywords match a description, or None.
+    Uses the cached category ids, so it can run before a row is inserted.
     """
-    if transaction.category_id is not None:
-        return False  # Already categorized
-    
-    description_lower = transaction.description.lower()
+    description_lower = description.lower()
+    category_ids = get_category_ids()
     
     # Iterate through categories and keywords
     for category_name, keywords in CATEGORY_KEYWORDS.items():
         for keyword in keywords:
             if keyword in description_lower:
-                # Find category (cached query)
-                category = Category.query.filter_by(name=category_name).first()
-                if category:
-                    transaction.category_id = category.id
-                    return True
+                category_id = category_ids.get(category_name)
+                if category_id is not None:
+                    return category_id
     
-    return False
+    return None
+
+
+def get_categories():
+    """
+    Return (id, name) rows for all categories, ordered by name.
+    Loaded once and reused; rows are plain tuples, so they outlive the session.
+    """
+    global _categories_cache
+    if _categories_cache is None:
+        _categories_cache = db.session.query(Category.id, Category.name)\
+            .order_by(Category.name).all()
+    return _categories_cache
+
+
+def get_category(category_id):
+    """Return the cached (id, name) row for a category id, or None if it does not exist"""
+    global _categories_by_id_cache
+    if _categories_by_id_cache is None:
+        _categories_by_id_cache = {category.id: category for category in get_categories()}
+    return _categories_by_id_cache.get(category_id)
+
+
+def get_category_ids():
+    """Return a {name: id} map of all categories, built from the cached rows"""
+    global _category_ids_cache
+    if _category_ids_cache is None:
+        _category_ids_cache = {name: category_id for category_id, name in get_categories()}
+    return _category_ids_cache
+
+
+def invalidate_category_cache():
+    """Forget cached categories so the next read reloads them"""
+    global _categories_cache, _categories_by_id_cache, _category_ids_cache
+    _categories_cache = None
+    _categories_by_id_cache = None
+    _category_ids_cache = None
+
+
+def month_range(year, month):
+    """
+    Return the half-open [start, end) datetime range covering a month.
+    Filtering on a plain range keeps the date column index usable.
+    """
+    start = datetime(year, month, 1)
+    if month == 12:
+        end = datetime(year + 1, 1, 1)
+    else:
+        end = datetime(year, month + 1, 1)
+    return start, end
+
+
+def get_cached_spending(user_id, year, month):
+    """Return the cached spending payload for a month, or None if missing/expired"""
+    with _spending_cache_lock:
+        user_entries = _spending_cache.get(user_id)
+        if not user_entries:
+            return None
+        
+        entry = user_entries.get((year, month))
+        if entry is None:
+            return None
+        
+        expires_at, payload = entry
+        if expires_at <= time.monotonic():
+            del user_entries[(year, month)]
+            return None
+        return payload
+
+
+def get_spending_generation(user_id):
+    """Return a token to pass to cache_spending(); read it before running the query"""
+    with _spending_cache_lock:
+        return _spending_epoch, _spending_generations.get(user_id, 0)
+
+
+def cache_spending(user_id, year, month, payload, ttl, generation):
+    """
+    Store a spending payload for a month for ttl seconds.
+    Skipped if the user's cache was invalidated after generation was read.
+    """
+    with _spending_cache_lock:
+        if generation != (_spending_epoch, _spending_generations.get(user_id, 0)):
+            return  # A write landed while this payload was computed; it may be stale
+        if user_id not in _spending_cache and len(_spending_cache) >= SPENDING_CACHE_MAX_USERS:
+            _spending_cache.clear()  # Crude bound; entries are cheap to rebuild
+        _spending_cache.setdefault(user_id, {})[(year, month)] = (time.monotonic() + ttl, payload)
+
+
+def invalidate_spending_cache(user_id):
+    """Drop all cached spending payloads for a user after their transactions change"""
+    global _spending_epoch
+    with _spending_cache_lock:
+        _spending_cache.pop(user_id, None)
+        if user_id not in _spending_generations and \
+                len(_spending_generations) >= SPENDING_CACHE_MAX_USERS:
+            _spending_generations.clear()
+            _spending_epoch += 1
+        _spending_generations[user_id] = _spending_generations.get(user_id, 0) + 1
 
 
 def initialize_categories():
@@ -52,14 +169,15 @@ def initialize_categories():
     """
     default_categories = list(CATEGORY_KEYWORDS.keys()) + ['Uncategorized', 'Other', 'Income']
     
-    for category_name in default_categories:
-        # Check if category already exists
-        if not Category.query.filter_by(name=category_name).first():
-            category = Category(name=category_name)
-            db.session.add(category)
-    
     try:
+        # One SELECT for the existing names and one executemany INSERT for the rest
+        existing = {name for (name,) in db.session.query(Category.name)}
+        missing = [{'name': name} for name in default_categories if name not in existing]
+        if missing:
+            db.session.bulk_insert_mappings(Category, missing)
         db.session.commit()
     except Exception as e:
         db.session.rollback()
-        print(f"Warning: Could not initialize categories: {e}")
+        logger.warning('Could not initialize categories: %s', e)
+    finally:
+        invalidate_category_cache()